@@ -1,10 +1,26 @@
-﻿import os
+"""FastAPI entry point.
+
+Development:
+    uvicorn app:app --reload
+    (or: python app.py)
+
+Production, one worker per core plus change (2*CPU+1):
+    gunicorn --preload -k uvicorn.workers.UvicornWorker -w 9 app:app
+
+With --preload the courses dataset, regexes, and indexes are built once
+in the master and shared copy-on-write across workers; the Neo4j driver
+is created lazily per worker after fork, so sockets are never shared.
+"""
+
+import asyncio
+import os
 from pathlib import Path
 
+import orjson
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
@@ -15,83 +31,121 @@ from kg import KnowledgeGraph
 BASE_DIR = Path(__file__).resolve().parent
 FRONTEND_DIR = BASE_DIR.parent / "frontend"
 
-load_dotenv()
-
-NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
-NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
-NEO4J_DATABASE = os.getenv("NEO4J_DATABASE")
-
-kg = KnowledgeGraph(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, NEO4J_DATABASE)
-
-courses = load_courses()
-chatbot = CourseChatbot(courses, kg)
-
-app = FastAPI(title="University Course Assistant Chatbot + Auto Knowledge Graph")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 
 class ChatRequest(BaseModel):
     text: str
 
 
-@app.post("/chat")
-def chat(req: ChatRequest):
-    reply, intent, entities = chatbot.process(req.text)
-    return {"reply": reply, "intent": intent, "entities": entities}
-
-
-@app.get("/health")
-def health():
-    ok, error = kg.health()
-    return {
-        "status": "ok",
-        "neo4j": "ok" if ok else "down",
-        "error": error,
-    }
-
-
-@app.get("/graph/summary")
-def graph_summary():
-    ok, error = kg.health()
-    if not ok:
-        return {"nodes": 0, "edges": 0, "error": error}
-    summary, err = kg.summary()
-    if err or summary is None:
-        return {"nodes": 0, "edges": 0, "error": err}
-    return summary
-
-
-@app.get("/graph/export")
-def graph_export():
-    ok, error = kg.health()
-    if not ok:
-        return {"nodes": [], "edges": [], "error": error}
-    graph, err = kg.export_graph()
-    if err or graph is None:
-        return {"nodes": [], "edges": [], "error": err}
-    return graph
-
-
-@app.get("/")
-def index():
-    return FileResponse(FRONTEND_DIR / "index.html")
-
-
-@app.get("/graph")
-def graph_page():
-    return FileResponse(FRONTEND_DIR / "graph.html")
-
-
-@app.on_event("shutdown")
-def shutdown_event():
-    kg.close()
-
-
-app.mount("/", StaticFiles(directory=FRONTEND_DIR), name="frontend")
+def create_app() -> FastAPI:
+    load_dotenv()
+
+    neo4j_uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+    neo4j_user = os.getenv("NEO4J_USER", "neo4j")
+    neo4j_password = os.getenv("NEO4J_PASSWORD", "password")
+    neo4j_database = os.getenv("NEO4J_DATABASE")
+
+    kg = KnowledgeGraph(neo4j_uri, neo4j_user, neo4j_password, neo4j_database)
+
+    courses = load_courses()
+    chatbot = CourseChatbot(courses, kg)
+
+    app = FastAPI(
+        title="University Course Assistant Chatbot + Auto Knowledge Graph",
+        default_response_class=ORJSONResponse,
+    )
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.post("/chat")
+    async def chat(req: ChatRequest):
+        reply, intent, entities = await asyncio.to_thread(chatbot.process, req.text)
+        return {"reply": reply, "intent": intent, "entities": entities}
+
+    @app.get("/health")
+    async def health():
+        ok, error = await asyncio.to_thread(kg.health)
+        return {
+            "status": "ok",
+            "neo4j": "ok" if ok else "down",
+            "error": error,
+        }
+
+    @app.get("/cache/stats")
+    def cache_stats():
+        info = chatbot.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "maxsize": info.maxsize,
+            "currsize": info.currsize,
+        }
+
+    @app.get("/graph/summary")
+    async def graph_summary():
+        ok, error = await asyncio.to_thread(kg.health)
+        if not ok:
+            return {"nodes": 0, "edges": 0, "error": error}
+        summary, err = await asyncio.to_thread(kg.summary)
+        if err or summary is None:
+            return {"nodes": 0, "edges": 0, "error": err}
+        return summary
+
+    @app.get("/graph/export")
+    async def graph_export():
+        ok, error = await asyncio.to_thread(kg.health)
+        if not ok:
+            return {"nodes": [], "edges": [], "error": error}
+
+        def generate():
+            yield b'{"nodes":['
+            in_edges = False
+            first = True
+            for kind, row in kg.iter_export():
+                if kind == "edge" and not in_edges:
+                    yield b'],"edges":['
+                    in_edges = True
+                    first = True
+                if not first:
+                    yield b","
+                yield orjson.dumps(row)
+                first = False
+            if not in_edges:
+                yield b'],"edges":['
+            yield b"]}"
+
+        return StreamingResponse(generate(), media_type="application/json")
+
+    @app.get("/")
+    def index():
+        return FileResponse(FRONTEND_DIR / "index.html")
+
+    @app.get("/graph")
+    def graph_page():
+        return FileResponse(FRONTEND_DIR / "graph.html")
+
+    @app.on_event("startup")
+    async def startup_event():
+        await asyncio.to_thread(kg.warm_up)
+
+    @app.on_event("shutdown")
+    def shutdown_event():
+        kg.flush_writes()
+        kg.close()
+
+    app.mount("/", StaticFiles(directory=FRONTEND_DIR), name="frontend")
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("app:app", host="0.0.0.0", port=8000)
@@ -1,95 +1,321 @@
-﻿import json
+﻿import collections
+import functools
+import os
 import re
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+import orjson
+
+try:
+    import hyperscan
+except ImportError:  # optional accelerator, not available on all platforms
+    hyperscan = None
+
+try:
+    import ahocorasick
+except ImportError:  # optional, lighter multi-string matcher than hyperscan
+    ahocorasick = None
+
+try:
+    from chatbot_hot import normalize_text, word_bounded
+except ImportError:  # optional Cython build, see chatbot_hot.pyx
+
+    def normalize_text(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def word_bounded(data: bytes, start: int, end: int) -> bool:
+        before = data[start - 1:start] if start > 0 else b""
+        after = data[end:end + 1]
+        return not before.isalnum() and not after.isalnum()
+
 
 COURSE_CODE_RE = re.compile(r"\b([A-Z]{3})\s?(\d{3})\b")
 SEMESTER_RE = re.compile(r"\b(Spring|Summer|Fall|Autumn|Winter)\s+\d{4}\b", re.IGNORECASE)
+TOKEN_RE = re.compile(r"[a-z]+")
+
+HELP_KEYWORDS = frozenset({"help", "commands"})
+GRAPH_KEYWORDS = frozenset({"graph", "kg"})
+TEACHER_KEYWORDS = frozenset({"teacher", "teach", "teaches", "instructor"})
+TITLE_KEYWORDS = frozenset({"title", "name"})
+CREDIT_KEYWORDS = frozenset({"credit", "credits"})
+SEMESTER_KEYWORDS = frozenset({"semester", "term"})
+TEACHER_COURSES_KEYWORDS = frozenset({"courses", "teach", "teaches"})
+DEPT_COURSES_KEYWORDS = frozenset({"department", "dept", "courses"})
+SEMESTER_COURSES_KEYWORDS = frozenset({"courses", "offered"})
+
+REPLY_TEMPLATES = {
+    "course_teacher": "{code} course er teacher: {teacher}. (Teacher of {code} is {teacher}.){warning}",
+    "course_title": "{code} course er title: {title}. (Title of {code} is {title}.){warning}",
+    "course_credit": "{code} course er credit: {credit}. (Credits of {code} are {credit}.){warning}",
+    "course_semester": (
+        "{code} course offered in: {semester}. ({code} is offered in {semester}.){warning}"
+    ),
+    "course_info": (
+        "{code}: {title}, {teacher}, {credit} credit, {semester}. "
+        "({code} course info: {title}, teacher {teacher}, "
+        "{credit} credits, offered in {semester}.){warning}"
+    ),
+    "teacher_courses": (
+        "{teacher} er courses: {course_list}. "
+        "(Courses taught by {teacher}: {course_list}.){warning}"
+    ),
+    "dept_courses": (
+        "{dept} department er courses: {course_list}. "
+        "(Courses in {dept} department: {course_list}.){warning}"
+    ),
+    "semester_courses": (
+        "{semester} er courses: {course_list}. "
+        "(Courses offered in {semester}: {course_list}.){warning}"
+    ),
+    "graph_show": (
+        "Graph summary: {nodes} nodes, {edges} edges. "
+        "(KG has {nodes} nodes and {edges} edges.)"
+    ),
+}
+
+COURSE_INTENTS = frozenset(
+    {"course_teacher", "course_title", "course_credit", "course_semester", "course_info"}
+)
 
 
 def load_courses() -> List[Dict]:
     data_path = Path(__file__).resolve().parent / "data" / "courses.json"
-    with data_path.open("r", encoding="utf-8-sig") as f:
-        return json.load(f)
+    raw = data_path.read_bytes()
+    if raw.startswith(b"\xef\xbb\xbf"):
+        raw = raw[3:]
+    return orjson.loads(raw)
 
 
 class CourseChatbot:
     def __init__(self, data: List[Dict], kg=None):
         self.data = data
         self.kg = kg
-        self.by_code = {c["course"].upper(): c for c in data}
+        self.by_teacher = collections.defaultdict(list)
+        self.by_dept_upper = collections.defaultdict(list)
+        self.by_semester_lower = collections.defaultdict(list)
+        for c in data:
+            c["_code_upper"] = c["course"].upper()
+            entry = {"code": c["course"], "title": c["title"]}
+            self.by_teacher[c["teacher"]].append(entry)
+            self.by_dept_upper[c["dept"].upper()].append(entry)
+            self.by_semester_lower[c["semester"].lower()].append(entry)
+        self.by_code = {c["_code_upper"]: c for c in data}
         self.teacher_names = sorted({c["teacher"] for c in data}, key=len, reverse=True)
         self.dept_names = sorted({c["dept"] for c in data}, key=len, reverse=True)
         self.semester_names = sorted({c["semester"] for c in data}, key=len, reverse=True)
+        self._teacher_canonical = {name.lower(): name for name in self.teacher_names}
         dept_pattern = "|".join(re.escape(name) for name in self.dept_names)
+        teacher_pattern = "|".join(re.escape(name) for name in self.teacher_names)
+        patterns = [
+            rf"(?P<code>{COURSE_CODE_RE.pattern})",
+            rf"(?P<sem>{SEMESTER_RE.pattern})",
+        ]
+        if dept_pattern:
+            patterns.append(rf"(?P<dept>\b(?:{dept_pattern})\b)")
+        if teacher_pattern:
+            patterns.append(rf"(?P<teacher>\b(?:{teacher_pattern})\b)")
+        self.entity_re = re.compile("|".join(patterns), re.IGNORECASE)
         self.dept_re = re.compile(rf"\b({dept_pattern})\b", re.IGNORECASE) if dept_pattern else None
+        self.teacher_re = (
+            re.compile(rf"\b({teacher_pattern})\b", re.IGNORECASE) if teacher_pattern else None
+        )
+        self._hs_db, self._hs_labels = self._build_hyperscan_db()
+        self._hs_local = threading.local()
+        self._ac_automaton = self._build_aho_corasick()
+        self._reply_cache = functools.lru_cache(maxsize=2048)(self._process_uncached)
+        self._semantic_cache = self._build_semantic_cache()
+        self._last_kg_ok = None
+        self._upserted = set()
+        if kg is not None:
+            kg.on_reconnect(self._upserted.clear)
+
+    def _entity_labels(self) -> List[Tuple[str, str]]:
+        return (
+            [("teacher", name) for name in self.teacher_names]
+            + [("dept", name.upper()) for name in self.dept_names]
+            + [("semester", name) for name in self.semester_names]
+        )
+
+    def _build_hyperscan_db(self):
+        if hyperscan is None:
+            return None, []
+        labels = self._entity_labels()
+        if not labels:
+            return None, []
+        try:
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[re.escape(value).encode("utf-8") for _, value in labels],
+                ids=list(range(len(labels))),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST] * len(labels),
+            )
+            return db, labels
+        except hyperscan.error:
+            return None, []
+
+    def _build_aho_corasick(self):
+        if self._hs_db is not None or ahocorasick is None:
+            return None
+        labels = self._entity_labels()
+        if not labels:
+            return None
+        automaton = ahocorasick.Automaton()
+        for category, value in labels:
+            automaton.add_word(value.lower(), (category, value))
+        automaton.make_automaton()
+        return automaton
+
+    @staticmethod
+    def _build_semantic_cache():
+        if os.getenv("ENABLE_SEMANTIC_CACHE", "").lower() not in ("1", "true", "yes"):
+            return None
+        try:
+            from semantic_cache import SemanticCache
+
+            return SemanticCache()
+        except ImportError:  # sentence-transformers / faiss not installed
+            return None
 
     def process(self, text: str) -> Tuple[str, str, Dict]:
-        entities = self.extract_entities(text)
-        intent = self.detect_intent(text, entities)
-        reply = self.build_reply(intent, entities)
+        normalized = normalize_text(text)
+        kg_ok, _ = self._kg_status()
+        if self._semantic_cache is not None:
+            if kg_ok != self._last_kg_ok:
+                self._semantic_cache.clear()
+            hit = self._semantic_cache.get(normalized)
+            if hit is not None:
+                self._last_kg_ok = kg_ok
+                return hit
+        self._last_kg_ok = kg_ok
+        result = self._reply_cache(normalized, kg_ok)
+        if self._semantic_cache is not None:
+            self._semantic_cache.put(normalized, result)
+        return result
+
+    def cache_info(self):
+        return self._reply_cache.cache_info()
+
+    def _process_uncached(self, text_lower: str, kg_ok: bool) -> Tuple[str, str, Dict]:
+        text_upper = text_lower.upper()
+        entities = self.extract_entities(text_lower, text_upper)
+        intent = self.detect_intent(text_lower, entities)
+        reply = self.build_reply(intent, entities, kg_ok)
         return reply, intent, entities
 
-    def extract_entities(self, text: str) -> Dict:
-        text_upper = text.upper()
-        text_lower = text.lower()
+    def extract_entities(self, text_lower: str, text_upper: Optional[str] = None) -> Dict:
+        if text_upper is None:
+            text_upper = text_lower.upper()
+        if self._hs_db is not None:
+            return self._extract_entities_hyperscan(text_lower, text_upper)
+        if self._ac_automaton is not None:
+            return self._extract_entities_aho_corasick(text_lower, text_upper)
+        entities = {"course_code": None, "teacher": None, "dept": None, "semester": None}
+        for match in self.entity_re.finditer(text_lower):
+            group = match.lastgroup
+            if group == "code" and entities["course_code"] is None:
+                entities["course_code"] = match.group("code").replace(" ", "").upper()
+            elif group == "sem" and entities["semester"] is None:
+                season, year = match.group("sem").split()
+                entities["semester"] = f"{season.title()} {year}"
+            elif group == "dept" and entities["dept"] is None:
+                entities["dept"] = match.group("dept").upper()
+            elif group == "teacher" and entities["teacher"] is None:
+                entities["teacher"] = self._teacher_canonical[match.group("teacher").lower()]
+        # A span consumed by another alternative (e.g. the "cse" in "cse 411")
+        # can hide a dept/teacher hit; re-check those slots independently so
+        # this path matches the Hyperscan and Aho-Corasick tiers.
+        if entities["dept"] is None and self.dept_re is not None:
+            dept_match = self.dept_re.search(text_lower)
+            if dept_match:
+                entities["dept"] = dept_match.group(1).upper()
+        if entities["teacher"] is None and self.teacher_re is not None:
+            teacher_match = self.teacher_re.search(text_lower)
+            if teacher_match:
+                entities["teacher"] = self._teacher_canonical[teacher_match.group(1).lower()]
+        return entities
+
+    def _extract_entities_hyperscan(self, text_lower: str, text_upper: str) -> Dict:
+        entities = {"course_code": None, "teacher": None, "dept": None, "semester": None}
+        data = text_lower.encode("utf-8")
+        best = {}
+
+        def on_match(pattern_id, start, end, flags, context):
+            category, value = self._hs_labels[pattern_id]
+            if not word_bounded(data, start, end):
+                return
+            current = best.get(category)
+            if current is None or end - start > current[0]:
+                best[category] = (end - start, value)
+
+        # Hyperscan scratch space must not be shared across threads, and
+        # process() runs from the to_thread pool; give each thread its own.
+        scratch = getattr(self._hs_local, "scratch", None)
+        if scratch is None:
+            scratch = hyperscan.Scratch(self._hs_db)
+            self._hs_local.scratch = scratch
+        self._hs_db.scan(data, match_event_handler=on_match, scratch=scratch)
+        for category, (_, value) in best.items():
+            entities[category] = value
+        self._apply_code_and_semester(entities, text_lower, text_upper)
+        return entities
+
+    def _extract_entities_aho_corasick(self, text_lower: str, text_upper: str) -> Dict:
+        entities = {"course_code": None, "teacher": None, "dept": None, "semester": None}
+        for end_index, (category, value) in self._ac_automaton.iter_long(text_lower):
+            if entities[category] is not None:
+                continue
+            start = end_index - len(value) + 1
+            before = text_lower[start - 1:start]
+            after = text_lower[end_index + 1:end_index + 2]
+            if not before.isalnum() and not after.isalnum():
+                entities[category] = value
+        self._apply_code_and_semester(entities, text_lower, text_upper)
+        return entities
+
+    @staticmethod
+    def _apply_code_and_semester(entities: Dict, text_lower: str, text_upper: str) -> None:
         code_match = COURSE_CODE_RE.search(text_upper)
-        course_code = None
         if code_match:
-            course_code = f"{code_match.group(1)}{code_match.group(2)}"
+            entities["course_code"] = f"{code_match.group(1)}{code_match.group(2)}"
+        if entities["semester"] is None:
+            semester_match = SEMESTER_RE.search(text_lower)
+            if semester_match:
+                season, year = semester_match.group(0).split()
+                entities["semester"] = f"{season.title()} {year}"
 
-        teacher = self._match_from_list(text_lower, self.teacher_names)
-        dept = None
-        if self.dept_re:
-            dept_match = self.dept_re.search(text_upper)
-            if dept_match:
-                dept = dept_match.group(1).upper()
-
-        semester = None
-        semester_match = SEMESTER_RE.search(text)
-        if semester_match:
-            season = semester_match.group(1).title()
-            year = semester_match.group(0).split()[-1]
-            semester = f"{season} {year}"
-
-        return {
-            "course_code": course_code,
-            "teacher": teacher,
-            "dept": dept,
-            "semester": semester,
-        }
-
-    def detect_intent(self, text: str, entities: Dict) -> str:
-        text_lower = text.lower()
-
-        if any(k in text_lower for k in ["help", "commands", "what can you do"]):
+    def detect_intent(self, text_lower: str, entities: Dict) -> str:
+        tokens = frozenset(TOKEN_RE.findall(text_lower))
+
+        if tokens & HELP_KEYWORDS or "what can you do" in text_lower:
             return "help"
-        if "graph" in text_lower or "kg" in text_lower:
+        if tokens & GRAPH_KEYWORDS:
             return "graph_show"
 
         if entities.get("course_code"):
-            if any(k in text_lower for k in ["teacher", "teach", "teaches", "instructor"]):
+            if tokens & TEACHER_KEYWORDS:
                 return "course_teacher"
-            if any(k in text_lower for k in ["title", "name"]):
+            if tokens & TITLE_KEYWORDS:
                 return "course_title"
-            if any(k in text_lower for k in ["credit", "credits"]):
+            if tokens & CREDIT_KEYWORDS:
                 return "course_credit"
-            if any(k in text_lower for k in ["semester", "term"]):
+            if tokens & SEMESTER_KEYWORDS:
                 return "course_semester"
             return "course_info"
 
-        if entities.get("teacher") and any(k in text_lower for k in ["courses", "teach", "teaches"]):
+        if entities.get("teacher") and tokens & TEACHER_COURSES_KEYWORDS:
             return "teacher_courses"
-        if entities.get("dept") and any(k in text_lower for k in ["department", "dept", "courses"]):
+        if entities.get("dept") and tokens & DEPT_COURSES_KEYWORDS:
             return "dept_courses"
-        if entities.get("semester") and any(k in text_lower for k in ["courses", "offered"]):
+        if entities.get("semester") and tokens & SEMESTER_COURSES_KEYWORDS:
             return "semester_courses"
 
         return "unknown"
 
-    def build_reply(self, intent: str, entities: Dict) -> str:
-        kg_ok, kg_error = self._kg_status()
+    def build_reply(self, intent: str, entities: Dict, kg_ok: Optional[bool] = None) -> str:
+        if kg_ok is None:
+            kg_ok, _ = self._kg_status()
         warning = ""
         if self.kg is not None and not kg_ok:
             warning = " Neo4j down, dataset result dekhacchi."
@@ -106,66 +332,24 @@ class CourseChatbot:
             summary, error = self.kg.summary()
             if error or summary is None:
                 return "Graph summary not available right now."
-            return (
-                f"Graph summary: {summary['nodes']} nodes, {summary['edges']} edges. "
-                f"(KG has {summary['nodes']} nodes and {summary['edges']} edges.)"
-            )
-
-        if intent == "course_teacher":
-            course = self._get_course(entities.get("course_code"))
-            if not course:
-                return "Course code not found. (No matching course.)"
-            self._try_upsert(course, kg_ok)
-            code = course["course"]
-            teacher = course["teacher"]
-            return (
-                f"{code} course er teacher: {teacher}. (Teacher of {code} is {teacher}.)" + warning
-            )
-
-        if intent == "course_title":
-            course = self._get_course(entities.get("course_code"))
-            if not course:
-                return "Course code not found. (No matching course.)"
-            self._try_upsert(course, kg_ok)
-            code = course["course"]
-            title = course["title"]
-            return f"{code} course er title: {title}. (Title of {code} is {title}.)" + warning
-
-        if intent == "course_credit":
-            course = self._get_course(entities.get("course_code"))
-            if not course:
-                return "Course code not found. (No matching course.)"
-            self._try_upsert(course, kg_ok)
-            code = course["course"]
-            credit = course["credit"]
-            return f"{code} course er credit: {credit}. (Credits of {code} are {credit}.)" + warning
-
-        if intent == "course_semester":
-            course = self._get_course(entities.get("course_code"))
-            if not course:
-                return "Course code not found. (No matching course.)"
-            self._try_upsert(course, kg_ok)
-            code = course["course"]
-            semester = course["semester"]
-            return (
-                f"{code} course offered in: {semester}. "
-                f"({code} is offered in {semester}.)" + warning
+            return REPLY_TEMPLATES[intent].format_map(
+                {"nodes": summary["nodes"], "edges": summary["edges"]}
             )
 
-        if intent == "course_info":
+        if intent in COURSE_INTENTS:
             course = self._get_course(entities.get("course_code"))
             if not course:
                 return "Course code not found. (No matching course.)"
             self._try_upsert(course, kg_ok)
-            code = course["course"]
-            title = course["title"]
-            teacher = course["teacher"]
-            credit = course["credit"]
-            semester = course["semester"]
-            return (
-                f"{code}: {title}, {teacher}, {credit} credit, {semester}. "
-                f"({code} course info: {title}, teacher {teacher}, "
-                f"{credit} credits, offered in {semester}.)" + warning
+            return REPLY_TEMPLATES[intent].format_map(
+                {
+                    "code": course["course"],
+                    "title": course["title"],
+                    "teacher": course["teacher"],
+                    "credit": course["credit"],
+                    "semester": course["semester"],
+                    "warning": warning,
+                }
             )
 
         if intent == "teacher_courses":
@@ -176,11 +360,7 @@ class CourseChatbot:
             if self.kg is not None and kg_ok:
                 courses, _ = self.kg.get_courses_by_teacher(teacher)
             if not courses:
-                courses = [
-                    {"code": c["course"], "title": c["title"]}
-                    for c in self.data
-                    if c["teacher"] == teacher
-                ]
+                courses = self.by_teacher.get(teacher, [])
             if not courses:
                 return "No courses found for that teacher."
             for course in courses:
@@ -188,9 +368,8 @@ class CourseChatbot:
                 if record:
                     self._try_upsert(record, kg_ok)
             course_list = ", ".join(c["code"] for c in courses)
-            return (
-                f"{teacher} er courses: {course_list}. "
-                f"(Courses taught by {teacher}: {course_list}.)" + warning
+            return REPLY_TEMPLATES[intent].format_map(
+                {"teacher": teacher, "course_list": course_list, "warning": warning}
             )
 
         if intent == "dept_courses":
@@ -201,11 +380,7 @@ class CourseChatbot:
             if self.kg is not None and kg_ok:
                 courses, _ = self.kg.get_courses_by_dept(dept)
             if not courses:
-                courses = [
-                    {"code": c["course"], "title": c["title"]}
-                    for c in self.data
-                    if c["dept"].upper() == dept.upper()
-                ]
+                courses = self.by_dept_upper.get(dept.upper(), [])
             if not courses:
                 return "No courses found for that department."
             for course in courses:
@@ -213,9 +388,8 @@ class CourseChatbot:
                 if record:
                     self._try_upsert(record, kg_ok)
             course_list = ", ".join(c["code"] for c in courses)
-            return (
-                f"{dept} department er courses: {course_list}. "
-                f"(Courses in {dept} department: {course_list}.)" + warning
+            return REPLY_TEMPLATES[intent].format_map(
+                {"dept": dept, "course_list": course_list, "warning": warning}
             )
 
         if intent == "semester_courses":
@@ -226,11 +400,7 @@ class CourseChatbot:
             if self.kg is not None and kg_ok:
                 courses, _ = self.kg.get_courses_by_semester(semester)
             if not courses:
-                courses = [
-                    {"code": c["course"], "title": c["title"]}
-                    for c in self.data
-                    if c["semester"].lower() == semester.lower()
-                ]
+                courses = self.by_semester_lower.get(semester.lower(), [])
             if not courses:
                 return "No courses found for that semester."
             for course in courses:
@@ -238,9 +408,8 @@ class CourseChatbot:
                 if record:
                     self._try_upsert(record, kg_ok)
             course_list = ", ".join(c["code"] for c in courses)
-            return (
-                f"{semester} er courses: {course_list}. "
-                f"(Courses offered in {semester}: {course_list}.)" + warning
+            return REPLY_TEMPLATES[intent].format_map(
+                {"semester": semester, "course_list": course_list, "warning": warning}
             )
 
         return "Sorry, bujhte parini. (Sorry, I could not understand.)"
@@ -253,16 +422,16 @@ class CourseChatbot:
     def _try_upsert(self, course: Dict, kg_ok: bool) -> None:
         if self.kg is None or not kg_ok:
             return
-        self.kg.upsert_course(course)
+        code = course["_code_upper"]
+        if code in self._upserted:
+            return
+        self.kg.enqueue_upsert(course)
+        self._upserted.add(code)
+        self._reply_cache.cache_clear()
+        if self._semantic_cache is not None:
+            self._semantic_cache.clear()
 
     def _get_course(self, code: Optional[str]) -> Optional[Dict]:
         if not code:
             return None
         return self.by_code.get(code.upper())
-
-    @staticmethod
-    def _match_from_list(text_lower: str, candidates: List[str]) -> Optional[str]:
-        for candidate in candidates:
-            if candidate.lower() in text_lower:
-                return candidate
-        return None
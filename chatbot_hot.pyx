@@ -0,0 +1,25 @@
+# cython: language_level=3
+# Optional compiled fast paths for chatbot.py.
+#
+# Build in place with:
+#     pip install cython && cythonize -i chatbot_hot.pyx
+#
+# chatbot.py falls back to pure-Python equivalents when this module has
+# not been built, so the extension is never required.
+
+
+cpdef str normalize_text(str text):
+    return " ".join(text.lower().split())
+
+
+cpdef bint word_bounded(bytes data, Py_ssize_t start, Py_ssize_t end):
+    cdef unsigned char b
+    if start > 0:
+        b = data[start - 1]
+        if (48 <= b <= 57) or (65 <= b <= 90) or (97 <= b <= 122):
+            return False
+    if end < len(data):
+        b = data[end]
+        if (48 <= b <= 57) or (65 <= b <= 90) or (97 <= b <= 122):
+            return False
+    return True
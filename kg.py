@@ -1,7 +1,17 @@
-﻿from typing import Dict, List, Optional, Tuple
+﻿import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
+from cachetools import TTLCache
 from neo4j import GraphDatabase
-from neo4j.exceptions import Neo4jError, ServiceUnavailable
+from neo4j.exceptions import ClientError, Neo4jError, ServiceUnavailable
+
+
+logger = logging.getLogger(__name__)
+
+_CACHE_MISS = object()
 
 
 class KnowledgeGraph:
@@ -11,10 +21,37 @@ class KnowledgeGraph:
         self.password = password
         self.database = database
         self.driver = None
+        self._reconnect_callbacks = []
+        self._read_cache = TTLCache(maxsize=512, ttl=60)
+        self._read_cache_lock = threading.Lock()
+        self._write_q = queue.Queue()
+        self._writer_thread = None
+        self._writer_lock = threading.Lock()
+        self._health_cache = None
+
+    def on_reconnect(self, callback) -> None:
+        self._reconnect_callbacks.append(callback)
 
     def connect(self) -> None:
         if self.driver is None:
-            self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+            self.driver = GraphDatabase.driver(
+                self.uri,
+                auth=(self.user, self.password),
+                max_connection_pool_size=50,
+                connection_acquisition_timeout=5,
+                keep_alive=True,
+            )
+            self._health_cache = None
+            for callback in self._reconnect_callbacks:
+                callback()
+
+    def warm_up(self) -> Tuple[bool, Optional[str]]:
+        try:
+            self.connect()
+            self.driver.verify_connectivity()
+            return True, None
+        except Exception as exc:
+            return False, str(exc)
 
     def close(self) -> None:
         if self.driver is not None:
@@ -25,15 +62,33 @@ class KnowledgeGraph:
         if self.driver is None:
             self.connect()
         if self.database:
-            return self.driver.session(database=self.database)
-        return self.driver.session()
+            return self.driver.session(database=self.database, fetch_size=1000)
+        return self.driver.session(fetch_size=1000)
+
+    def _cache_get(self, key):
+        with self._read_cache_lock:
+            return self._read_cache.get(key, _CACHE_MISS)
+
+    def _cache_put(self, key, value) -> None:
+        with self._read_cache_lock:
+            self._read_cache[key] = value
+
+    def _cache_clear(self) -> None:
+        with self._read_cache_lock:
+            self._read_cache.clear()
 
     def health(self) -> Tuple[bool, Optional[str]]:
+        now = time.monotonic()
+        if self._health_cache is not None and now - self._health_cache[0] < 5:
+            _, ok, error = self._health_cache
+            return ok, error
         try:
             with self._session() as session:
                 session.run("RETURN 1").consume()
+            self._health_cache = (now, True, None)
             return True, None
         except Exception as exc:
+            self._health_cache = (now, False, str(exc))
             return False, str(exc)
 
     def ensure_constraints(self) -> Tuple[bool, Optional[str]]:
@@ -74,61 +129,156 @@ class KnowledgeGraph:
         try:
             with self._session() as session:
                 session.run(cypher, params).consume()
+            self._cache_clear()
             return True, None
         except Exception as exc:
             return False, str(exc)
 
-    def summary(self) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+    def enqueue_upsert(self, record: Dict) -> None:
+        self._ensure_writer()
+        self._write_q.put(record)
+
+    def flush_writes(self) -> None:
+        batch = []
+        while True:
+            try:
+                batch.append(self._write_q.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self.upsert_courses(batch)
+
+    def _ensure_writer(self) -> None:
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer_thread is not None and self._writer_thread.is_alive():
+                return
+            self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer_thread.start()
+
+    def _writer_loop(self) -> None:
+        while True:
+            batch = [self._write_q.get()]
+            deadline = time.monotonic() + 0.1
+            while len(batch) < 50:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._write_q.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            _, error = self.upsert_courses(batch)
+            if error:
+                logger.warning(
+                    "Batched course upsert failed, requeueing %d records: %s",
+                    len(batch),
+                    error,
+                )
+                for record in batch:
+                    self._write_q.put(record)
+                time.sleep(1)
+
+    def upsert_courses(self, records: List[Dict]) -> Tuple[int, Optional[str]]:
         cypher = """
-        MATCH (n)
-        OPTIONAL MATCH ()-[r]->()
-        RETURN count(DISTINCT n) AS nodes, count(r) AS rels
+        UNWIND $rows AS r
+        MERGE (c:Course {code: r.code})
+        ON CREATE SET c.title = r.title, c.credit = r.credit
+        ON MATCH SET c.title = r.title, c.credit = r.credit
+        MERGE (t:Teacher {name: r.teacher})
+        MERGE (d:Department {name: r.dept})
+        MERGE (s:Semester {name: r.semester})
+        MERGE (c)-[:TAUGHT_BY]->(t)
+        MERGE (c)-[:BELONGS_TO]->(d)
+        MERGE (c)-[:OFFERED_IN]->(s)
         """
+        rows = [
+            {
+                "code": record.get("course"),
+                "title": record.get("title"),
+                "credit": record.get("credit"),
+                "teacher": record.get("teacher"),
+                "dept": record.get("dept"),
+                "semester": record.get("semester"),
+            }
+            for record in records
+        ]
+        if not rows:
+            return 0, None
         try:
             with self._session() as session:
-                record = session.run(cypher).single()
-                if record is None:
-                    return {"nodes": 0, "edges": 0}, None
-                return {"nodes": record["nodes"], "edges": record["rels"]}, None
+                session.execute_write(
+                    lambda tx: tx.run(cypher, {"rows": rows}).consume()
+                )
+            self._cache_clear()
+            return len(rows), None
         except Exception as exc:
-            return None, str(exc)
+            return 0, str(exc)
 
-    def export_graph(self) -> Tuple[Optional[Dict], Optional[str]]:
+    def summary(self) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+        key = ("summary",)
+        cached = self._cache_get(key)
+        if cached is not _CACHE_MISS:
+            return cached, None
         try:
             with self._session() as session:
-                node_rows = session.run(
-                    "MATCH (n) RETURN id(n) AS id, labels(n)[0] AS label, properties(n) AS props"
-                )
-                nodes = [
-                    {"id": row["id"], "type": row["label"], "props": row["props"]}
-                    for row in node_rows
-                ]
-                edge_rows = session.run(
-                    "MATCH (a)-[r]->(b) RETURN id(r) AS id, type(r) AS type, id(a) AS source, id(b) AS target"
-                )
-                edges = [
-                    {
-                        "id": row["id"],
-                        "type": row["type"],
-                        "source": row["source"],
-                        "target": row["target"],
-                    }
-                    for row in edge_rows
-                ]
-            return {"nodes": nodes, "edges": edges}, None
+                summary = self._summary_apoc(session)
+                if summary is None:
+                    nodes = session.run("MATCH (n) RETURN count(n) AS c").single()["c"]
+                    rels = session.run("MATCH ()-[r]->() RETURN count(r) AS c").single()["c"]
+                    summary = {"nodes": nodes, "edges": rels}
+                self._cache_put(key, summary)
+                return summary, None
         except Exception as exc:
             return None, str(exc)
 
+    @staticmethod
+    def _summary_apoc(session) -> Optional[Dict[str, int]]:
+        try:
+            record = session.run(
+                "CALL apoc.meta.stats() YIELD nodeCount, relCount"
+            ).single()
+        except ClientError:  # APOC not installed
+            return None
+        if record is None:
+            return None
+        return {"nodes": record["nodeCount"], "edges": record["relCount"]}
+
+    def iter_export(self):
+        with self._session() as session:
+            node_rows = session.run(
+                "MATCH (n) RETURN id(n) AS id, labels(n)[0] AS label, properties(n) AS props"
+            )
+            for row in node_rows:
+                yield "node", {"id": row["id"], "type": row["label"], "props": row["props"]}
+            edge_rows = session.run(
+                "MATCH (a)-[r]->(b) RETURN id(r) AS id, type(r) AS type, id(a) AS source, id(b) AS target"
+            )
+            for row in edge_rows:
+                yield "edge", {
+                    "id": row["id"],
+                    "type": row["type"],
+                    "source": row["source"],
+                    "target": row["target"],
+                }
+
     def get_courses_by_teacher(self, teacher: str) -> Tuple[List[Dict], Optional[str]]:
         cypher = """
         MATCH (t:Teacher {name: $teacher})<-[:TAUGHT_BY]-(c:Course)
         RETURN c.code AS code, c.title AS title
         ORDER BY c.code
         """
+        key = ("teacher", teacher)
+        cached = self._cache_get(key)
+        if cached is not _CACHE_MISS:
+            return cached, None
         try:
             with self._session() as session:
                 rows = session.run(cypher, {"teacher": teacher})
-                return [dict(row) for row in rows], None
+                courses = [dict(row) for row in rows]
+                self._cache_put(key, courses)
+                return courses, None
         except Exception as exc:
             return [], str(exc)
 
@@ -138,10 +288,16 @@ class KnowledgeGraph:
         RETURN c.code AS code, c.title AS title
         ORDER BY c.code
         """
+        key = ("dept", dept)
+        cached = self._cache_get(key)
+        if cached is not _CACHE_MISS:
+            return cached, None
         try:
             with self._session() as session:
                 rows = session.run(cypher, {"dept": dept})
-                return [dict(row) for row in rows], None
+                courses = [dict(row) for row in rows]
+                self._cache_put(key, courses)
+                return courses, None
         except Exception as exc:
             return [], str(exc)
 
@@ -151,9 +307,15 @@ class KnowledgeGraph:
         RETURN c.code AS code, c.title AS title
         ORDER BY c.code
         """
+        key = ("semester", semester)
+        cached = self._cache_get(key)
+        if cached is not _CACHE_MISS:
+            return cached, None
         try:
             with self._session() as session:
                 rows = session.run(cypher, {"semester": semester})
-                return [dict(row) for row in rows], None
+                courses = [dict(row) for row in rows]
+                self._cache_put(key, courses)
+                return courses, None
         except Exception as exc:
             return [], str(exc)
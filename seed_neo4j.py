@@ -19,15 +19,11 @@ def main() -> None:
         print(f"Failed to apply constraints: {error}")
 
     courses = load_courses()
-    success_count = 0
-    for course in courses:
-        ok, error = kg.upsert_course(course)
-        if ok:
-            success_count += 1
-        else:
-            print(f"Failed to upsert {course.get('course')}: {error}")
-
-    print(f"Seeded {success_count} courses into Neo4j.")
+    count, error = kg.upsert_courses(courses)
+    if error:
+        print(f"Failed to upsert courses: {error}")
+
+    print(f"Seeded {count} courses into Neo4j.")
     kg.close()
 
 
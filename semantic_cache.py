@@ -0,0 +1,66 @@
+import threading
+from typing import Optional, Tuple
+
+
+class SemanticCache:
+    """Approximate reply cache that matches paraphrased prompts.
+
+    Embeds normalized query text with a small sentence-transformers
+    model and reuses the reply of the nearest recent query when cosine
+    similarity clears the threshold. Optional: requires
+    sentence-transformers and faiss, and is only enabled when
+    ENABLE_SEMANTIC_CACHE is set (see CourseChatbot).
+
+    get/put/clear are guarded by a lock because the chatbot runs from
+    the to_thread pool; at maxsize the oldest half of the entries is
+    evicted and the index rebuilt, so the hit rate degrades gradually
+    instead of resetting to zero.
+    """
+
+    def __init__(self, threshold: float = 0.93, maxsize: int = 4096):
+        import numpy
+        from sentence_transformers import SentenceTransformer
+
+        import faiss
+
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        self._np = numpy
+        self._faiss = faiss
+        self.index = faiss.IndexFlatIP(self.model.get_sentence_embedding_dimension())
+        self.vectors = []
+        self.replies = []
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str):
+        return self.model.encode([text], normalize_embeddings=True).astype("float32")
+
+    def get(self, text: str) -> Optional[Tuple]:
+        vec = self._embed(text)
+        with self._lock:
+            if not self.replies:
+                return None
+            sims, idxs = self.index.search(vec, 1)
+            if idxs[0][0] >= 0 and sims[0][0] >= self.threshold:
+                return self.replies[idxs[0][0]]
+            return None
+
+    def put(self, text: str, reply: Tuple) -> None:
+        vec = self._embed(text)
+        with self._lock:
+            if len(self.replies) >= self.maxsize:
+                keep = self.maxsize // 2
+                self.vectors = self.vectors[-keep:]
+                self.replies = self.replies[-keep:]
+                self.index.reset()
+                self.index.add(self._np.vstack(self.vectors))
+            self.index.add(vec)
+            self.vectors.append(vec)
+            self.replies.append(reply)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.index.reset()
+            self.vectors = []
+            self.replies = []